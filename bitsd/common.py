@@ -8,12 +8,20 @@
 
 """Common elements needed by all modules."""
 
+from tornado.ioloop import IOLoop
 from tornado.netutil import bind_sockets, bind_unix_socket
 from tornado.options import options
 
+import functools
+import json
 import logging
 import os
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 #: Main logger
 LOG = logging.getLogger('tornado.general')
@@ -46,3 +54,17 @@ def bind(server, port, usocket, address=None):
         sockets = bind_sockets(port, address=address)
         server.add_sockets(sockets)
         LOG.info('Started')
+
+
+def json_encode(data):
+    """Serialize `data` to a compact JSON string, using `orjson`
+    if available."""
+    if orjson is not None:
+        return orjson.dumps(data).decode('utf-8')
+    return json.dumps(data, separators=(',', ':'))
+
+
+def defer(function, *args):
+    """Run `function(*args)` on a later iteration of the IOLoop, after
+    the current handler has returned. Deferred calls run in order."""
+    IOLoop.instance().add_callback(functools.partial(function, *args))
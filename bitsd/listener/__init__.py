@@ -13,6 +13,7 @@ ports/hosts/address or events (on the countrary, a server will actually
 """
 
 
+from tornado.ioloop import PeriodicCallback
 from tornado.options import options
 
 from .handlers import RemoteListener
@@ -24,6 +25,11 @@ def start():
     """Connect and bind listeners. **MUST** be called at startup."""
     __inject_broadcast()
 
+    PeriodicCallback(
+        hooks.flush_temperature_queue,
+        options.temperature_flush_interval
+    ).start()
+
     fonera = RemoteListener()
     LOG.info('Starting remote control...')
     LOG.info(
@@ -40,6 +46,11 @@ def start():
     )
 
 
+def stop():
+    """Write data still pending. Should be called at shutdown."""
+    hooks.flush_temperature_queue()
+
+
 def __inject_broadcast():
     """Lazily load broadcast() function to break circular dependencies"""
     from bitsd.server.handlers import broadcast
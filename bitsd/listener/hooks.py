@@ -14,17 +14,43 @@ Hooks called by `.handlers` to handle specific commands.
 #     : and in __all__ below!!
 
 import base64
+import collections
+import functools
+import re
+import time
+
+try:
+    import pybase64
+except ImportError:
+    pybase64 = None
+
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from tornado.options import options
+
 from bitsd.listener import notifier
 
 from bitsd.persistence.engine import session_scope
-from bitsd.persistence.models import Status
+import bitsd.persistence.engine as engine
+from bitsd.persistence.models import Status, TemperatureSample
 import bitsd.persistence.query as query
-from bitsd.common import LOG
+from bitsd.common import LOG, defer
+
 
+#: Well-formed base64 payload, used when the decoder cannot validate it
+_BASE64_RE = re.compile(br'^[A-Za-z0-9+/]*={0,2}\Z')
 
 #: This will be initialized by bitsd.listener.start()
 broadcast = None
 
+#: Accepted values for the status command (0 is closed, 1 is open)
+_VALID_STATUS = frozenset((0, 1))
+
+#: Last accepted temperature (value, time) pair, by sensor id
+_LAST_TEMPERATURE = {}
+
+#: Temperature samples waiting to be written by `flush_temperature_queue()`
+_TEMPERATURE_QUEUE = collections.deque()
+
 
 __all__ = [
     'handle_temperature_command',
@@ -36,77 +62,156 @@ __all__ = [
 ]
 
 
+def typed_args(*types):
+    """Decorator converting the positional arguments of a hook with
+    the given types, in order. If a conversion fails, an error is logged
+    and the hook is not called. A wrong number of arguments is left for
+    the hook to report (as TypeError)."""
+    def decorator(hook):
+        @functools.wraps(hook)
+        def wrapper(*args):
+            if len(args) != len(types):
+                return hook(*args)
+            try:
+                args = [convert(arg) for convert, arg in zip(types, args)]
+            except ValueError:
+                LOG.error('Wrong type for parameters in %s: %r', hook.__name__, args)
+                return
+            return hook(*args)
+        return wrapper
+    return decorator
+
+
+@typed_args(int, float)
 def handle_temperature_command(sensorid, value):
     """Receives and log data received from remote sensor."""
-    LOG.info('Received temperature: sensorid={}, value={}'.format(sensorid, value))
-    try:
-        sensorid = int(sensorid)
-        value = float(value)
-    except ValueError:
-        LOG.error('Wrong type for parameters in temperature command!')
+    LOG.info('Received temperature: sensorid=%s, value=%s', sensorid, value)
+    now = time.time()
+    last, last_time = _LAST_TEMPERATURE.get(sensorid, (None, 0))
+    if (last is not None and abs(value - last) < options.temperature_deadband and
+            now - last_time < options.temperature_max_interval):
+        LOG.debug('Temperature within deadband of %s, ignoring.', last)
         return
+    _LAST_TEMPERATURE[sensorid] = (value, now)
 
+    _TEMPERATURE_QUEUE.append(TemperatureSample(value, sensorid, 'BITS'))
+    if len(_TEMPERATURE_QUEUE) >= options.temperature_batch_size:
+        flush_temperature_queue()
+
+
+def flush_temperature_queue():
+    """Write all queued temperature samples in a single transaction,
+    then broadcast them. If the batch is rejected because of a duplicate
+    sample, fall back to one transaction per sample, so that only the
+    duplicates are lost. On other DB errors, unwritten samples are queued
+    again for the next flush.
+    Called periodically by bitsd.listener.start() and at shutdown."""
+    if not _TEMPERATURE_QUEUE:
+        return
+    pending = _unique_samples(_TEMPERATURE_QUEUE)
+    _TEMPERATURE_QUEUE.clear()
+    try:
+        if _write_temperatures(pending):
+            pending = []
+        else:
+            LOG.warning('Duplicate temperature sample in batch, writing one by one.')
+            while pending:
+                if not _write_temperatures(pending[:1]):
+                    LOG.error('Duplicate temperature sample %s, dropped.', pending[0])
+                pending = pending[1:]
+    except SQLAlchemyError as error:
+        LOG.error('Could not write %d temperature samples, retrying later: %s',
+                  len(pending), error)
+        _TEMPERATURE_QUEUE.extendleft(reversed(pending))
+
+
+def _b64decode(data):
+    """Decode base64 `data`, raising ValueError (or TypeError, on Python 2)
+    if it contains characters outside the base64 alphabet."""
+    if pybase64 is not None:
+        return pybase64.b64decode(data, validate=True)
+    if not _BASE64_RE.match(data):
+        raise ValueError('Invalid base64 data')
+    return base64.b64decode(data)
+
+
+def _unique_samples(samples):
+    """Drop samples with the same sensor and timestamp of a previous one.
+    On MySQL timestamps are compared to the second, the resolution
+    of DATETIME; other backends keep microseconds."""
+    to_second = engine.Engine.dialect.name == 'mysql'
+    seen = set()
+    unique = []
+    for sample in samples:
+        timestamp = sample.timestamp
+        if to_second:
+            timestamp = timestamp.replace(microsecond=0)
+        key = (sample.sensor, timestamp)
+        if key not in seen:
+            seen.add(key)
+            unique.append(sample)
+    return unique
+
+
+def _write_temperatures(samples):
+    """Write `samples` in one transaction, then broadcast them.
+    Return False, writing and broadcasting nothing, if any of them
+    is a duplicate."""
     with session_scope() as session:
-        temp = query.log_temperature(session, value, sensorid, 'BITS')
+        try:
+            query.log_temperatures(session, samples)
+            # Commit here: session_scope() would swallow an IntegrityError
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            return False
+    # Only once committed, so that a retried batch is not broadcast twice
+    for temp in samples:
         broadcast(temp.jsondict())
+    return True
 
 
+@typed_args(int)
 def handle_status_command(status):
     """Update status.
     Will reject two identical and consecutive updates
     (prevents opening when already open and vice-versa)."""
-    LOG.info('Received status: {}'.format(status))
-    try:
-        status = int(status)
-    except ValueError:
-        LOG.error('Wrong type for parameters in temperature command')
-        return
-    if status not in (0, 1):
-        LOG.error('Non existent status {}, ignoring.'.format(status))
+    LOG.info('Received status: %s', status)
+    if status not in _VALID_STATUS:
+        LOG.error('Non existent status %s, ignoring.', status)
         return
 
     textstatus = Status.OPEN if status == 1 else Status.CLOSED
     with session_scope() as session:
-        curstatus = query.get_current_status(session)
-        if curstatus is None or curstatus.value != textstatus:
+        if query.get_current_status_value(session) != textstatus:
             status = query.log_status(session, textstatus, 'BITS')
-            broadcast(status.jsondict())
-            notifier.send_status(textstatus)
+            broadcast(status.jsonframe())
+            defer(notifier.send_status, textstatus)
         else:
             LOG.error('BITS already open/closed! Ignoring.')
 
 
+@typed_args(int)
 def handle_enter_command(userid):
     """Handles signal triggered when a new user enters."""
-    LOG.info('Received enter command: id={}'.format(userid))
-    try:
-        userid = int(userid)
-    except ValueError:
-        LOG.error('Wrong type for parameters in temperature command!')
-        return
-
+    LOG.info('Received enter command: id=%s', userid)
     LOG.error('handle_enter_command not implemented.')
 
 
+@typed_args(int)
 def handle_leave_command(userid):
     """Handles signal triggered when a known user leaves."""
-    LOG.info('Received leave command: id={}'.format(userid))
-    try:
-        userid = int(userid)
-    except ValueError:
-        LOG.error('Wrong type for parameters in temperature command!')
-        return
-
+    LOG.info('Received leave command: id=%s', userid)
     LOG.error('handle_leave_command not implemented.')
 
 
 def handle_message_command(message):
     """Handles message broadcast requests."""
-    LOG.info('Received message command: message={!r}'.format(message))
+    LOG.info('Received message command: message=%r', message)
     try:
-        decodedmex = base64.b64decode(message)
-    except TypeError:
-        LOG.error('Received message is not valid base64: {!r}'.format(message))
+        decodedmex = _b64decode(message)
+    except (TypeError, ValueError):
+        LOG.error('Received message is not valid base64: %r', message)
     else:
         text = decodedmex.decode('utf8')
         #FIXME maybe get author ID from message?
@@ -114,20 +219,15 @@ def handle_message_command(message):
         with session_scope() as session:
             user = query.get_user(session, user)
             if not user:
-                LOG.error("Non-existent user {}, not logging message.".format(user))
+                LOG.error("Non-existent user %s, not logging message.", user)
                 return
             message = query.log_message(session, user, text)
             broadcast(message.jsondict())
-        notifier.send_message(text)
+        defer(notifier.send_message, text)
 
 
+@typed_args(int)
 def handle_sound_command(soundid):
     """Handles requests to play a sound."""
-    LOG.info('Received sound command: id={}'.format(soundid))
-    try:
-        soundid = int(soundid)
-    except ValueError:
-        LOG.error('Wrong type for parameters in temperature command!')
-        return
-    else:
-        notifier.send_sound(soundid)
+    LOG.info('Received sound command: id=%s', soundid)
+    defer(notifier.send_sound, soundid)
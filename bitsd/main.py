@@ -45,6 +45,7 @@ def sig_handler(sig, frame):
 def shutdown():
     """Stop server and add callback to stop i/o loop."""
     io_loop = tornado.ioloop.IOLoop.instance()
+    listener.stop()
     LOG.info('Shutting down in 2 seconds')
     io_loop.add_timeout(time.time() + 2, io_loop.stop)
 
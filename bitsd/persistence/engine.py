@@ -13,6 +13,7 @@ indipendently from the model.
 
 from contextlib import contextmanager
 from sqlalchemy import desc, create_engine
+from sqlalchemy.engine.url import make_url
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker, scoped_session
 from tornado.options import options
@@ -29,10 +30,19 @@ def connect():
     Open a connection to DB using parameters  from bitsd.conf and command line.
     """
     global Session, Engine
+    pool_options = {}
+    # SQLite does not use a QueuePool, it would reject sizing arguments.
+    if not make_url(options.db_uri).drivername.startswith('sqlite'):
+        pool_options = dict(
+            pool_size=options.pool_size,
+            max_overflow=options.max_overflow,
+        )
     Engine = create_engine(
         options.db_uri,
         pool_recycle=options.connection_recycle_timeout,
-        echo=options.log_queries
+        pool_pre_ping=True,
+        echo=options.log_queries,
+        **pool_options
     )
     session_factory = sessionmaker(bind=Engine)
     Session = scoped_session(session_factory)
@@ -53,6 +63,9 @@ def session_scope():
         session.rollback()
         raise
     finally:
+        # Detach everything, so that objects handed to broadcast() do not
+        # keep the identity map alive after the connection is returned.
+        session.expunge_all()
         session.close()
 
 
@@ -62,16 +75,24 @@ def persist(session, data, flush=True):
 
     **Note:** will log what's being persisted, so don't put clear text password
     into `__str__()`."""
-    LOG.debug('Persisting data {}'.format(data))
+    LOG.debug('Persisting data %s', data)
     session.add(data)
     if flush:
         session.flush()
     return data
 
 
+def persist_all(session, data):
+    """Persist a sequence of objects with a single bulk INSERT.
+    Objects are not attached to the session, so their state is not
+    refreshed from the DB."""
+    LOG.debug('Persisting %d objects', len(data))
+    session.bulk_save_objects(data)
+
+
 def delete(session, data):
     """Delete data from DB."""
-    LOG.debug('Deleting {}'.format(data))
+    LOG.debug('Deleting %s', data)
     session.delete(data)
 
 
@@ -25,6 +25,11 @@ from . import engine
 Base = declarative_base()
 
 
+def jsontimestamp(timestamp):
+    """Convert a datetime to milliseconds since epoch, as sent to clients."""
+    return int(float(timestamp.strftime('%s.%f')) * 1000)
+
+
 def check():
     """Check if all the tables are present in the DB, create them otherwise."""
     Base.metadata.create_all(engine.Engine, checkfirst=True)
@@ -40,10 +45,12 @@ class TemperatureSample(Base):
     sensor = Column(Integer, primary_key=True)
     modified_by = Column(Enum('BITS', 'web'), nullable=False)
 
-    def __init__(self, value, sensor, modified_by):
+    def __init__(self, value, sensor, modified_by, timestamp=None):
         self.value = value
         self.sensor = sensor
         self.modified_by = modified_by
+        # Set now, so that the sample is complete before being flushed.
+        self.timestamp = timestamp if timestamp is not None else datetime.now()
 
     def __str__(self):
         return 'Temperature {.value}°C'.format(self)
@@ -51,7 +58,7 @@ class TemperatureSample(Base):
     def jsondict(self, wrap=True):
         """Return a JSON-serializable dictionary representing the object"""
         data = {
-            "timestamp": int(float(self.timestamp.strftime('%s.%f')) * 1000),
+            "timestamp": jsontimestamp(self.timestamp),
             "value": self.value,
             "modifiedby": self.modified_by,
             "sensor": self.sensor
@@ -88,7 +95,7 @@ class Status(Base):
     def jsondict(self, wrap=True):
         """Return a JSON-serializable dictionary representing the object"""
         data = {
-            "timestamp": int(float(self.timestamp.strftime('%s.%f')) * 1000),
+            "timestamp": jsontimestamp(self.timestamp),
             "modifiedby": self.modified_by,
             "value": self.value
         }
@@ -97,6 +104,25 @@ class Status(Base):
         else:
             return data
 
+    def jsonframe(self):
+        """Return the same as `jsondict(wrap=True)`, already serialized
+        to JSON. Only the timestamp is formatted, the rest comes from
+        precomputed templates.
+
+        **Note:** the frame must reach SockJS as already-JSON (as done by
+        `bitsd.server.handlers.broadcast()`), passing it to `send()` would
+        encode it again as a JSON string."""
+        return _STATUS_FRAMES[self.value, self.modified_by] % jsontimestamp(self.timestamp)
+
+
+#: Serialized wrapped Status, by (value, modified_by), see `Status.jsonframe()`
+_STATUS_FRAMES = dict(
+    ((value, modified_by),
+     '{"status":{"timestamp":%%d,"modifiedby":"%s","value":"%s"}}' % (modified_by, value))
+    for value in (Status.OPEN, Status.CLOSED, Status.AWAY)
+    for modified_by in ('BITS', 'web')
+)
+
 
 class Message(Base):
     """Representation of a broadcast message.
@@ -118,7 +144,7 @@ class Message(Base):
         """Return a JSON-serializable dictionary representing the object"""
         data = {
             'user': self.author.name,
-            'timestamp': int(float(self.timestamp.strftime('%s.%f')) * 1000),
+            'timestamp': jsontimestamp(self.timestamp),
             'value': self.message,
         }
         return {'message': data} if wrap else data
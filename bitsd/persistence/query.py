@@ -10,12 +10,14 @@
 Common query helpers. These are shortcut to queries performed often
 by server engine.
 """
+from sqlalchemy import desc, event
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session as ORMSession
 
 from tornado.options import options
 
-from .engine import persist, query_by_timestamp, count, query_by_attribute
-from .models import TemperatureSample, Status, Message, Page, User
+from .engine import persist, persist_all, query_by_timestamp, count, query_by_attribute
+from .models import TemperatureSample, Status, Message, Page, User, jsontimestamp
 
 
 ## Exceptions ##
@@ -23,6 +25,25 @@ from .models import TemperatureSample, Status, Message, Page, User
 class SameTimestampException(Exception):
     pass
 
+#: Value of the most recently logged status, kept in memory to spare
+#: a query on every status change. See `get_current_status_value()`.
+#: Only updated when the transaction logging the status commits.
+_current_status_value = None
+
+
+@event.listens_for(ORMSession, 'after_commit')
+def _commit_status_value(session):
+    """Publish the status value logged in the committed transaction."""
+    global _current_status_value
+    if 'status_value' in session.info:
+        _current_status_value = session.info.pop('status_value')
+
+
+@event.listens_for(ORMSession, 'after_rollback')
+def _discard_status_value(session):
+    """Forget the status value logged in the rolled back transaction."""
+    session.info.pop('status_value', None)
+
 ## Getters ##
 
 def get_current_status(session):
@@ -30,6 +51,17 @@ def get_current_status(session):
     return query_by_timestamp(session, Status, limit=1)
 
 
+def get_current_status_value(session):
+    """Return the value of the most recent status, or None if no status
+    was ever logged. The DB is queried only the first time."""
+    global _current_status_value
+    if _current_status_value is None:
+        status = get_current_status(session)
+        if status is not None:
+            _current_status_value = status.value
+    return _current_status_value
+
+
 def get_current_temperature(session):
     """Return the most recent temperature sample."""
     return query_by_timestamp(session, TemperatureSample, limit=1)
@@ -40,6 +72,30 @@ def get_latest_temperature_samples(session):
     return query_by_timestamp(session, TemperatureSample, limit=100)
 
 
+def get_latest_temperature_samples_raw(session):
+    """Same as `get_latest_temperature_samples()`, but return rows as
+    JSON-serializable dictionaries (see `TemperatureSample.jsondict()`),
+    skipping ORM objects entirely."""
+    rows = session \
+        .query(
+            TemperatureSample.timestamp,
+            TemperatureSample.value,
+            TemperatureSample.modified_by,
+            TemperatureSample.sensor
+        ) \
+        .order_by(desc(TemperatureSample.timestamp)) \
+        .limit(100)
+    return [
+        {
+            "timestamp": jsontimestamp(timestamp),
+            "value": value,
+            "modifiedby": modified_by,
+            "sensor": sensor
+        }
+        for timestamp, value, modified_by, sensor in rows
+    ]
+
+
 def get_latest_statuses(session, limit=20, offset=0):
     """Query last 20 Status by timestamp."""
     return query_by_timestamp(session, Status, limit=limit, offset=offset)
@@ -76,7 +132,7 @@ def get_latest_data(session):
     """Get recent data as a JSON-serializable dictionary."""
     status = get_current_status(session)
     temp = get_current_temperature(session)
-    latest_temp_samples = get_latest_temperature_samples(session)
+    latest_temp_samples = get_latest_temperature_samples_raw(session)
     latest_message = get_current_message(session)
 
     json_or_none = lambda data: data.jsondict(wrap=False) if data is not None else ""
@@ -85,7 +141,7 @@ def get_latest_data(session):
         "tempint": json_or_none(temp),
         "version": options.jsonver,
         "message": json_or_none(latest_message),
-        "tempinthist": [sample.jsondict(wrap=False) for sample in latest_temp_samples]
+        "tempinthist": latest_temp_samples
     }
 
     # Prune null attributes
@@ -94,14 +150,17 @@ def get_latest_data(session):
 
 ## Loggers ##
 
-def log_temperature(session, value, sensor, modified_by):
-    """Add a temperature sample to the DB."""
-    return persist(session, TemperatureSample(value, sensor, modified_by))
+def log_temperatures(session, samples):
+    """Add a batch of TemperatureSample objects to the DB."""
+    persist_all(session, samples)
 
 
 def log_status(session, status, modified_by):
     """Persist status to the DB."""
-    return persist(session, Status(status, modified_by))
+    status = persist(session, Status(status, modified_by))
+    # Made current by _commit_status_value(), once committed
+    session.info['status_value'] = status.value
+    return status
 
 
 def log_message(session, user, message):
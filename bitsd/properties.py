@@ -46,6 +46,12 @@ define("control_remote_address",
     group="Networking"
 )
 
+define("websocket_compression_level",
+    default=6,
+    help="zlib level for permessage-deflate on websockets (0 disables compression).",
+    group="Networking"
+)
+
 define("db_uri",
     default="sqlite:///test.db",
     help="DB URI, in the form `dialect:///username:password@host`",
@@ -58,6 +64,30 @@ define("connection_recycle_timeout",
     group="Database"
 )
 
+define("pool_size",
+    default=50,
+    help="Number of DB connections kept open in the pool. Ignored for SQLite",
+    group="Database"
+)
+
+define("max_overflow",
+    default=20,
+    help="Number of DB connections allowed beyond pool_size under load. Ignored for SQLite",
+    group="Database"
+)
+
+define("temperature_flush_interval",
+    default=1000,
+    help="Interval between batched writes of temperature samples, in milliseconds",
+    group="Database"
+)
+
+define("temperature_batch_size",
+    default=100,
+    help="Number of queued temperature samples that triggers an immediate write",
+    group="Database"
+)
+
 define("config",
     default='', help="Configuration file to read", group='Config'
 )
@@ -71,6 +101,18 @@ define("mdescape",
     help="Escape literal HTML in Markdown source.", group='Internal'
 )
 
+define("temperature_deadband",
+    default=0.1,
+    help="Ignore temperature samples differing less than this from the last one of the same sensor",
+    group='Internal'
+)
+
+define("temperature_max_interval",
+    default=300,
+    help="Log a temperature sample within the deadband anyway if the last one of the same sensor is older than this, in seconds",
+    group='Internal'
+)
+
 define("assets_path",
     default='bitsd/server/assets',
     help='Path to assets (for integrated server).',
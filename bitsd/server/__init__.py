@@ -26,6 +26,10 @@ from bitsd.common import LOG, bind
 def start():
     """Setup HTTP/WS server. **MUST** be called prior to any operation."""
     StatusRouter = SockJSRouter(handlers.StatusConnection, "/data")
+    status_urls = [
+        (url, handlers.COMPRESSED_TRANSPORTS.get(handler, handler), kwargs)
+        for url, handler, kwargs in StatusRouter.urls
+    ]
 
     application = tornado.web.Application([
             # FIXME daltonism workaround, should be implemented client-side
@@ -39,13 +43,15 @@ def start():
             (r'/admin', handlers.AdminPageHandler),
             (r'/message', handlers.MessagePageHandler),
             (r'/data.php', handlers.RTCHandler)
-        ] + StatusRouter.urls,
+        ] + status_urls,
         ui_modules=uimodules,
         gzip=True,
         debug=options.developer_mode,
         static_path=options.assets_path,
         xsrf_cookies=True,
-        cookie_secret=options.cookie_secret
+        cookie_secret=options.cookie_secret,
+        # Clients are not supposed to send anything on /data
+        websocket_max_message_size=4096
     )
     server = tornado.httpserver.HTTPServer(application) #TODO other options
     LOG.info('Starting HTTP/WS server...')
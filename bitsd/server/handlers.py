@@ -13,6 +13,8 @@ HTTP requests handlers.
 
 import markdown
 import datetime
+import time
+from email.utils import formatdate
 from sqlalchemy.exc import IntegrityError
 from tornado.escape import xhtml_escape
 
@@ -23,6 +25,7 @@ import tornado.auth
 from tornado.options import options
 
 from sockjs.tornado import SockJSConnection
+from sockjs.tornado.transports import WebSocketTransport, RawWebSocketTransport
 
 import bitsd.listener.notifier as notifier
 from bitsd.persistence.engine import session_scope
@@ -34,7 +37,7 @@ from .notifier import MessageNotifier
 
 import bitsd.persistence.query as query
 
-from bitsd.common import LOG
+from bitsd.common import LOG, defer, json_encode
 
 
 def cache(seconds):
@@ -53,19 +56,42 @@ def cache(seconds):
         `seconds`: TTL of the cached resource, in seconds.
     """
     def set_cacheable(get_function):
+        cache_control = "max-age=" + str(seconds)
+        # (second, formatted header), recomputed at most once per second.
+        expires = [None, None]
+
         def wrapper(self, *args, **kwargs):
-            self.set_header("Expires", datetime.datetime.utcnow() +
-                datetime.timedelta(seconds=seconds))
-            self.set_header("Cache-Control", "max-age=" + str(seconds))
+            now = int(time.time())
+            if expires[0] != now:
+                expires[:] = [now, formatdate(now + seconds, usegmt=True)]
+            self.set_header("Expires", expires[1])
+            self.set_header("Cache-Control", cache_control)
             return get_function(self, *args, **kwargs)
         return wrapper
     return set_cacheable
 
 
+#: Markdown converters, built once and reset before each use.
+#: Which one is used depends on `options.mdescape`.
+MD_ESCAPE = markdown.Markdown(safe_mode='escape')
+MD_PLAIN = markdown.Markdown()
+
+
+#: Latest data sent to newly connected clients, JSON-serialized once
+#: and rebuilt lazily by `StatusConnection.on_open()` after each invalidation.
+_LATEST_CACHE = {"frame": None}
+
+
 def broadcast(message):
     """Broadcast given message to all clients. `message`
-    may be either a string, which is directly broadcasted, or a dictionay
-    that is JSON-serialized automagically before sending."""
+    may be either a string, which must be already JSON-encoded, or a
+    dictionary that is JSON-serialized once before sending to all clients.
+
+    Every broadcast is a state change, so the latest data cache
+    is invalidated as well."""
+    if isinstance(message, dict):
+        message = json_encode(message)
+    _LATEST_CACHE["frame"] = None
     StatusConnection.CLIENTS.broadcast(message)
 
 
@@ -132,11 +158,15 @@ class LogPageHandler(BaseHandler):
 
     def get_integer_or_400(self, name, default):
         """Try to get the parameter by name (and default), then convert it to
-        integer. In case of failure, raise a HTTP error 400"""
-        try:
-            return int(self.get_argument(name, default))
-        except ValueError:
+        a non-negative integer. In case of failure, raise a HTTP error 400"""
+        values = self.request.arguments.get(name)
+        if not values:
+            return default
+        # Raw bytes: skip the unicode decoding done by get_argument()
+        value = values[-1].strip()
+        if not value.isdigit():
             raise tornado.web.HTTPError(400)
+        return int(value)
 
 
 class StatusPageHandler(BaseHandler):
@@ -159,11 +189,9 @@ class MarkdownPageHandler(BaseHandler):
             if page is None:
                 raise tornado.web.HTTPError(404)
 
+            md = MD_ESCAPE if options.mdescape else MD_PLAIN
             self.render('templates/mdpage.html',
-                body=markdown.markdown(
-                    page.body,
-                    safe_mode='escape' if options.mdescape else False,
-                ),
+                body=md.reset().convert(page.body),
                 title=page.title,
             )
 
@@ -175,11 +203,26 @@ class StatusConnection(SockJSConnection):
     def on_open(self, info):
         """Register new handler with MessageNotifier."""
         StatusConnection.CLIENTS.register(self)
-        with session_scope() as session:
-            latest = query.get_latest_data(session)
-        self.send(latest)
+        frame = _LATEST_CACHE["frame"]
+        if frame is None:
+            with session_scope() as session:
+                frame = json_encode(query.get_latest_data(session))
+            _LATEST_CACHE["frame"] = frame
+        self.send_jsonified(frame)
         LOG.debug('Registered client')
 
+    def send_jsonified(self, frame):
+        """Send `frame`, a string that is already JSON-encoded.
+        `send()` would encode it again, delivering a JSON string
+        instead of an object to the client."""
+        if self.is_closed:
+            return
+        if self.session.send_expects_json:
+            self.session.send_jsonified(frame)
+        else:
+            # Raw websocket sessions write strings as they are
+            self.session.send_message(frame)
+
     def on_message(self, message):
         """Disconnect clients sending data (they should not)."""
         LOG.warning('Client sent a message: disconnected.')
@@ -189,6 +232,34 @@ class StatusConnection(SockJSConnection):
         StatusConnection.CLIENTS.unregister(self)
         LOG.debug('Unregistered client.')
 
+
+class CompressionMixin(object):
+    """Negotiate permessage-deflate on SockJS websocket transports,
+    so that repetitive JSON frames are compressed."""
+    def get_compression_options(self):
+        if not options.websocket_compression_level:
+            return None
+        return {
+            "compression_level": options.websocket_compression_level,
+            "mem_level": 8,
+        }
+
+
+class CompressedWebSocketTransport(CompressionMixin, WebSocketTransport):
+    pass
+
+
+class CompressedRawWebSocketTransport(CompressionMixin, RawWebSocketTransport):
+    pass
+
+
+#: Replacements for the websocket transports routed by SockJSRouter
+COMPRESSED_TRANSPORTS = {
+    WebSocketTransport: CompressedWebSocketTransport,
+    RawWebSocketTransport: CompressedRawWebSocketTransport,
+}
+
+
 class LoginPageHandler(BaseHandler):
     """Handle login browser requests for reserved area."""
     def get(self):
@@ -216,10 +287,10 @@ class LoginPageHandler(BaseHandler):
                 username,
                 expires_days=options.cookie_max_age_days
             )
-            LOG.info("Authenticating user `{}`".format(username))
+            LOG.info("Authenticating user `%s`", username)
             self.redirect(next)
         else:
-            LOG.warning("Wrong authentication for user `{}`".format(username))
+            LOG.warning("Wrong authentication for user `%s`", username)
             self.render(
                 'templates/login.html',
                 next=next,
@@ -255,20 +326,20 @@ class AdminPageHandler(BaseHandler):
         """Manually change the status of the BITS system"""
 
         with session_scope() as session:
-            curstatus = query.get_current_status(session)
+            curstatus = query.get_current_status_value(session)
 
             if curstatus is None:
                 textstatus = Status.CLOSED
             else:
-                textstatus = Status.OPEN if curstatus.value == Status.CLOSED else Status.CLOSED
+                textstatus = Status.OPEN if curstatus == Status.CLOSED else Status.CLOSED
 
-            LOG.info('Change of BITS to status={}'.format(textstatus) +
-                     ' from web interface.')
+            LOG.info('Change of BITS to status=%s from web interface.',
+                     textstatus)
             message = ''
             try:
                 status = query.log_status(session, textstatus, 'web')
-                broadcast(status.jsondict())
-                notifier.send_status(textstatus)
+                broadcast(status.jsonframe())
+                defer(notifier.send_status, textstatus)
                 message = "Ora la sede è {}.".format(textstatus)
             except IntegrityError:
                 LOG.error("Status changed too quickly, not logged.")
@@ -303,15 +374,20 @@ class MessagePageHandler(BaseHandler):
 
         text = xhtml_escape(text)
 
-        LOG.info("{} sent message {!r} from web".format(username, text))
+        LOG.info("%s sent message %r from web", username, text)
 
+        # Only DB work in here, so the connection goes back to the pool ASAP
+        message = None
         with session_scope() as session:
             user = query.get_user(session, username)
-            message = query.log_message(session, user, text)
+            message = query.log_message(session, user, text).jsondict()
+
+        # None if session_scope() swallowed an IntegrityError
+        if message is not None:
             LOG.info("Broadcasting to clients")
-            broadcast(message.jsondict())
+            broadcast(message)
             LOG.info("Notifying Fonera")
-            notifier.send_message(text)
+            defer(notifier.send_message, text)
 
         self.render(
             'templates/message.html',
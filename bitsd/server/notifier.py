@@ -10,25 +10,31 @@
 Broadcast notifier via websocket push for BITSd events.
 """
 
-from bitsd.common import LOG
+from bitsd.common import LOG, json_encode
 
 class MessageNotifier(object):
-    """Keeps a list of WebSocket handlers to notify with a message."""
+    """Keeps a set of WebSocket handlers to notify with a message."""
     def __init__(self, name):
-        self.clients = []
+        self.clients = set()
         self.name = name
 
     def register(self, client):
-        """Add a new handler to the clients list."""
-        LOG.debug('Adding client {} to {}'.format(client, self.name))
-        self.clients.append(client)
+        """Add a new handler to the clients set."""
+        LOG.debug('Adding client %s to %s', client, self.name)
+        self.clients.add(client)
 
     def unregister(self, client):
-        """Remove the handler from the clients list."""
-        LOG.debug('Removing client {} from {}'.format(client, self.name))
-        self.clients.remove(client)
+        """Remove the handler from the clients set, if present."""
+        LOG.debug('Removing client %s from %s', client, self.name)
+        self.clients.discard(client)
 
     def broadcast(self, message):
-        """Notify all clients."""
-        for client in self.clients:
-            client.send(message)
+        """Notify all clients. `message` is either a dictionary, which is
+        JSON-serialized once rather than once per client, or a string
+        that is already JSON-encoded. Clients must implement
+        `send_jsonified()`, see `bitsd.server.handlers.StatusConnection`."""
+        if isinstance(message, dict):
+            message = json_encode(message)
+        # Iterate on a snapshot, clients may unregister while we send.
+        for client in tuple(self.clients):
+            client.send_jsonified(message)
@@ -6,6 +6,8 @@
 # GNU GPLv3. See COPYING at top level for more information.
 #
 
+import time
+
 from bitsd.persistence.engine import session_scope
 from bitsd.persistence.models import Status
 
@@ -13,6 +15,10 @@ from sqlalchemy import asc
 
 
 class PresenceForecaster:
+    #: Seconds a forecast is reused before being recomputed,
+    #: matches the HTTP cache TTL of PresenceForecastHandler.
+    CACHE_TTL = 86400
+
     class InvalidResolutionError(Exception):
         def __init__(self):
             self.message = "Resolution must be a submultiple of 60 minutes!"
@@ -24,10 +30,15 @@ class PresenceForecaster:
         self.samples_count = samples_cont
         self.ticks_per_hour = 60 / resolution
         self.minutes_per_tick = resolution
+        self.cached_forecast = None
+        self.cached_period = None
 
     def forecast(self):
-        #TODO caching
-        return self.calculate_frequencies()
+        period = int(time.time() // self.CACHE_TTL)
+        if self.cached_period != period:
+            self.cached_forecast = self.calculate_frequencies()
+            self.cached_period = period
+        return self.cached_forecast
 
     def calculate_frequencies(self):
         samples = self.get_samples()